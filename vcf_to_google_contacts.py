@@ -5,263 +5,474 @@ Script para convertir archivos .vcf (vCard) a CSV compatible con Google Contacts
 Maneja duplicados, normaliza nombres y unifica múltiples contactos.
 """
 
+import codecs
 import csv
-import re
+import itertools
+import multiprocessing
+import quopri
 import sys
+import unicodedata
 from collections import defaultdict
-from typing import Dict, List, Set
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Tabla para str.translate que elimina todo lo que no sea dígito o '+'
+_PHONE_KEEP = str.maketrans('', '', ''.join(chr(c) for c in range(256) if chr(c) not in '0123456789+'))
+
+
+def _name_key(fn: str) -> str:
+    """Clave canónica de un nombre: sin acentos, en minúsculas y con las palabras ordenadas"""
+    s = unicodedata.normalize('NFKD', fn)
+    s = ''.join(c for c in s if not unicodedata.combining(c)).lower()
+    return ' '.join(sorted(s.replace(',', ' ').split()))
+
+
+def _phone_key(number: str, country_code: str = '') -> str:
+    """Clave de comparación de un teléfono ya limpio: el número completo en formato
+    internacional sin '+' ni '00'. Los números nacionales solo se pasan a formato
+    internacional si se indica un código de país por defecto."""
+    if number.startswith('+'):
+        return number[1:].replace('+', '')
+    number = number.replace('+', '')
+    if number.startswith('00'):
+        return number[2:]
+    if country_code:
+        # Se descarta el prefijo troncal nacional ('0') antes de añadir el código de país
+        return country_code + (number[1:] if number.startswith('0') else number)
+    return number
+
+
+# Etiquetas de tipo habituales: se reutiliza una única cadena por tipo
+_TYPE_NAMES = {t.upper(): t for t in ('Cell', 'Home', 'Work', 'Voice', 'Fax', 'Pref', 'Main', 'Other', 'Internet')}
+
+# Tipos que pueden aparecer como parámetro suelto, sin 'TYPE='
+_BARE_TYPES = frozenset({'CELL', 'HOME', 'WORK', 'VOICE', 'FAX', 'PREF', 'MAIN'})
+
+# Caracteres del valor de PHOTO que se conservan
+_PHOTO_MAX_LEN = 100
+
+_HEX_DIGITS = frozenset('0123456789ABCDEFabcdef')
+
+
+def _looks_qp(value: str) -> bool:
+    """Indica si el valor tiene alguna secuencia =XX o un salto suave '=' al final"""
+    i = value.find('=')
+    while i >= 0:
+        if i + 1 == len(value):
+            return True
+        if i + 2 < len(value) and value[i + 1] in _HEX_DIGITS and value[i + 2] in _HEX_DIGITS:
+            return True
+        i = value.find('=', i + 1)
+    return False
+
+
+# Nombre de relleno que nunca debe usarse para fusionar contactos
+_NO_NAME_KEY = _name_key('Sin nombre')
+
+
+@dataclass(slots=True)
+class Contact:
+    """Contacto normalizado; teléfonos, emails y direcciones son listas de dicts"""
+    fn: str = ''
+    family_name: str = ''
+    given_name: str = ''
+    middle_name: str = ''
+    phones: List[Dict] = field(default_factory=list)
+    emails: List[Dict] = field(default_factory=list)
+    notes: str = ''
+    org: str = ''
+    addresses: List[Dict] = field(default_factory=list)
+    photo: str = ''
+    # Clave normalizada del nombre, calculada una sola vez (ver _name_key)
+    name_key: str = ''
 
 
 class VCardParser:
     """Parser para archivos vCard (.vcf)"""
 
-    def __init__(self, vcf_file: str):
+    def __init__(self, vcf_file: str, workers: int = 1, country_code: str = ''):
         self.vcf_file = vcf_file
+        self.workers = workers
+        # Código de país por defecto (p. ej. '34') para comparar números nacionales
+        self.country_code = country_code.lstrip('+')
         self.contacts = []
 
-    def parse(self) -> List[Dict]:
-        """Lee y parsea el archivo .vcf completo"""
+    def parse(self) -> List[Contact]:
+        """Lee y parsea el archivo .vcf línea a línea, un vCard a la vez"""
         try:
-            with open(self.vcf_file, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
+            encoding = self._detect_encoding()
+            with open(self.vcf_file, 'r', encoding=encoding, errors='ignore') as f:
+                vcards = self._iter_vcards(f)
+                if self.workers > 1:
+                    # Cada vCard es independiente: se reparten en bloques entre procesos.
+                    # imap conserva el orden del archivo, del que depende la fusión
+                    with multiprocessing.Pool(self.workers, _init_worker, (self.country_code,)) as pool:
+                        results = pool.imap(_parse_vcard_worker, vcards, chunksize=256)
+                        self.contacts.extend(c for c in results if c)
+                else:
+                    self.contacts.extend(c for c in map(self._parse_vcard, vcards) if c)
         except Exception as e:
             print(f"Error crítico al leer el archivo: {e}")
             return []
 
-        # Unir líneas continuadas que empiezan con espacio o tab en todo el archivo
-        content = re.sub(r'\r?\n[ \t]', '', content)
-
-        # Dividir en vCards individuales
-        vcards = content.split('END:VCARD')
+        return self.contacts
 
-        for vcard_text in vcards:
-            if 'BEGIN:VCARD' not in vcard_text:
+    def _detect_encoding(self) -> str:
+        """Detecta la codificación por su BOM; sin BOM se asume UTF-8"""
+        with open(self.vcf_file, 'rb') as f:
+            head = f.read(4)
+        # UTF-32 primero: su BOM little-endian empieza igual que el de UTF-16
+        if head.startswith((codecs.BOM_UTF32_LE, codecs.BOM_UTF32_BE)):
+            return 'utf-32'
+        if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+            return 'utf-16'
+        # utf-8-sig descarta el BOM de UTF-8 si existe
+        return 'utf-8-sig'
+
+    def _iter_vcards(self, f: Iterable[str]) -> Iterator[List[str]]:
+        """Produce cada vCard como lista de líneas ya desplegadas y sin espacios"""
+        current: List[str] = []
+        in_card = False
+        prev_line = None
+        # Longitud a partir de la cual ya no se despliega la línea anterior (solo PHOTO)
+        prev_limit = None
+
+        for raw_line in itertools.chain(f, [None]):
+            # Las líneas que empiezan con espacio o tab continúan la anterior
+            if raw_line is not None and raw_line[:1] in (' ', '\t'):
+                if prev_line is not None and (prev_limit is None or len(prev_line) < prev_limit):
+                    prev_line += raw_line[1:].rstrip('\r\n')
                 continue
 
-            contact = self._parse_vcard(vcard_text)
-            if contact:
-                self.contacts.append(contact)
-
-        return self.contacts
-
-    def _decode_value(self, value: str, params: List[str]) -> str:
+            if prev_line is not None:
+                line = prev_line.strip()
+                if line == 'BEGIN:VCARD':
+                    # Un vCard sin END:VCARD se cierra al empezar el siguiente
+                    if in_card and current:
+                        yield current
+                    current = []
+                    in_card = True
+                elif line == 'END:VCARD':
+                    if in_card:
+                        yield current
+                    current = []
+                    in_card = False
+                elif in_card and line:
+                    current.append(line)
+
+            if raw_line is None:
+                # Fin del archivo con un vCard truncado (sin END:VCARD): se conserva
+                if in_card and current:
+                    yield current
+                break
+
+            prev_line = raw_line.rstrip('\r\n')
+            prev_limit = None
+            if prev_line[:6].upper() in ('PHOTO:', 'PHOTO;'):
+                # La foto se trunca a _PHOTO_MAX_LEN: el resto del base64 no se acumula
+                colon = prev_line.find(':')
+                if colon >= 0:
+                    prev_limit = colon + 1 + _PHOTO_MAX_LEN
+
+    def _decode_value(self, value: str, params_upper: List[str]) -> str:
         """Decodifica un valor si está marcado como QUOTED-PRINTABLE."""
-        is_quoted = any('ENCODING=QUOTED-PRINTABLE' in p.upper() for p in params)
+        is_quoted = any('ENCODING=QUOTED-PRINTABLE' in p for p in params_upper)
 
         if is_quoted:
+            # Solo se llama a quopri si hay algo que decodificar; en ambos casos el
+            # valor QUOTED-PRINTABLE se devuelve sin el tratamiento de escapes de abajo
+            if not _looks_qp(value):
+                return value
             try:
-                import quopri
-                return quopri.decodestring(value).decode('utf-8', 'ignore')
+                return quopri.decodestring(value.encode('utf-8')).decode('utf-8', 'ignore')
             except Exception:
                 return value
 
+        # Camino rápido: la mayoría de los valores no tienen secuencias de escape
+        if '\\' not in value:
+            return value.strip()
         return value.replace('\\n', '\n').replace('\\,', ',').replace('\\;', ';').strip()
 
-    def _parse_vcard(self, vcard_text: str) -> Dict:
-        """Parsea un vCard individual y extrae todos los campos"""
-        contact = {
-            'fn': '', 'family_name': '', 'given_name': '', 'middle_name': '',
-            'phones': [], 'emails': [], 'notes': '', 'org': '', 'addresses': [], 'photo': ''
-        }
-
-        lines = vcard_text.strip().split('\n')
+    def _parse_vcard(self, lines: List[str]) -> Optional[Contact]:
+        """Parsea un vCard individual (lista de líneas desplegadas) y extrae todos los campos"""
+        contact = Contact()
 
         for line in lines:
-            line = line.strip()
-            if not line or ':' not in line:
+            # Una sola búsqueda de ':' y de ';' (dentro del nombre) por línea
+            colon = line.find(':')
+            if colon < 0:
                 continue
 
-            field_part, _, value = line.partition(':')
-            field_parts = field_part.split(';')
-            field = field_parts[0].upper()
-            params = field_parts[1:]
-
-            decoded_value = self._decode_value(value, params)
-
-            if field == 'FN':
-                contact['fn'] = decoded_value
-            elif field == 'N':
-                parts = decoded_value.split(';')
-                contact['family_name'] = parts[0] if len(parts) > 0 else ''
-                contact['given_name'] = parts[1] if len(parts) > 1 else ''
-                contact['middle_name'] = parts[2] if len(parts) > 2 else ''
-            elif field == 'TEL':
-                phone = self._clean_phone(decoded_value)
-                if phone:
-                    contact['phones'].append({'number': phone, 'type': self._extract_type(params)})
-            elif field == 'EMAIL':
-                if '@' in decoded_value:
-                    contact['emails'].append({'address': decoded_value, 'type': self._extract_type(params)})
-            elif field == 'NOTE':
-                contact['notes'] = (contact['notes'] + ' | ' + decoded_value) if contact['notes'] else decoded_value
-            elif field == 'ORG':
-                contact['org'] = decoded_value
-            elif field == 'ADR':
-                addr = decoded_value.replace(';', ', ')
-                if addr:
-                    contact['addresses'].append({'address': addr, 'type': self._extract_type(params)})
-            elif field == 'PHOTO':
-                contact['photo'] = value[:100]
-
-        contact['fn'] = self._normalize_full_name(contact)
-        if contact['fn'] or contact['phones']:
+            semi = line.find(';', 0, colon)
+            name_end = colon if semi < 0 else semi
+
+            # Los campos sin manejador se descartan antes de tocar parámetros o valor
+            handler = self._FIELD_HANDLERS.get(line[:name_end].upper())
+            if handler is None:
+                continue
+
+            # Los parámetros se pasan a mayúsculas una sola vez por línea
+            params_upper = line[semi + 1:colon].upper().split(';') if semi >= 0 else []
+            handler(self, contact, line[colon + 1:], params_upper)
+
+        contact.fn = self._normalize_full_name(contact)
+        contact.name_key = _name_key(contact.fn)
+        if contact.fn or contact.phones:
             return contact
         return None
 
-    def _extract_type(self, params: List[str]) -> str:
-        """Extrae el tipo de un campo (CELL, HOME, WORK, etc.)"""
-        for param in params:
-            if param.upper().startswith('TYPE='):
-                return param.split('=')[1].capitalize()
-            elif param.upper() in ['CELL', 'HOME', 'WORK', 'VOICE', 'FAX', 'PREF', 'MAIN']:
-                return param.capitalize()
+    def _h_fn(self, contact: Contact, value: str, params_upper: List[str]):
+        """Campo FN: nombre completo"""
+        contact.fn = self._decode_value(value, params_upper)
+
+    def _h_n(self, contact: Contact, value: str, params_upper: List[str]):
+        """Campo N: apellido;nombre;segundo nombre"""
+        family, _, rest = self._decode_value(value, params_upper).partition(';')
+        given, _, rest = rest.partition(';')
+        middle, _, _ = rest.partition(';')
+        contact.family_name = family
+        contact.given_name = given
+        contact.middle_name = middle
+
+    def _h_tel(self, contact: Contact, value: str, params_upper: List[str]):
+        """Campo TEL: teléfono"""
+        phone = self._clean_phone(self._decode_value(value, params_upper))
+        if phone:
+            # 'canon' es la clave con la que se detectan teléfonos duplicados
+            contact.phones.append({'number': phone, 'type': self._extract_type(params_upper),
+                                   'canon': _phone_key(phone, self.country_code)})
+
+    def _h_email(self, contact: Contact, value: str, params_upper: List[str]):
+        """Campo EMAIL: correo electrónico"""
+        email = self._decode_value(value, params_upper)
+        if '@' in email:
+            # '_lc' guarda la dirección en minúsculas para no recalcularla al fusionar
+            contact.emails.append({'address': email, 'type': self._extract_type(params_upper), '_lc': email.lower()})
+
+    def _h_note(self, contact: Contact, value: str, params_upper: List[str]):
+        """Campo NOTE: notas, concatenadas si hay varias"""
+        note = self._decode_value(value, params_upper)
+        contact.notes = (contact.notes + ' | ' + note) if contact.notes else note
+
+    def _h_org(self, contact: Contact, value: str, params_upper: List[str]):
+        """Campo ORG: organización"""
+        contact.org = self._decode_value(value, params_upper)
+
+    def _h_adr(self, contact: Contact, value: str, params_upper: List[str]):
+        """Campo ADR: dirección"""
+        addr = self._decode_value(value, params_upper).replace(';', ', ')
+        if addr:
+            contact.addresses.append({'address': addr, 'type': self._extract_type(params_upper)})
+
+    def _h_photo(self, contact: Contact, value: str, params_upper: List[str]):
+        """Campo PHOTO: se guarda truncada y sin decodificar"""
+        contact.photo = value[:_PHOTO_MAX_LEN]
+
+    # Tabla de despacho: campo vCard -> manejador
+    _FIELD_HANDLERS = {
+        'FN': _h_fn, 'N': _h_n, 'TEL': _h_tel, 'EMAIL': _h_email,
+        'NOTE': _h_note, 'ORG': _h_org, 'ADR': _h_adr, 'PHOTO': _h_photo,
+    }
+
+    def _extract_type(self, params_upper: List[str]) -> str:
+        """Extrae el tipo de un campo (CELL, HOME, WORK, etc.) de sus parámetros en mayúsculas"""
+        for param in params_upper:
+            if param.startswith('TYPE='):
+                type_name = param.split('=')[1]
+                return _TYPE_NAMES.get(type_name) or type_name.capitalize()
+            elif param in _BARE_TYPES:
+                return _TYPE_NAMES[param]
         return 'Other'
 
     def _clean_phone(self, phone: str) -> str:
         """Limpia y normaliza un número de teléfono"""
-        phone = re.sub(r'[^\d+]', '', phone)
+        phone = phone.translate(_PHONE_KEEP)
+        if not phone.isascii():
+            # La tabla solo cubre Latin-1: filtrar el resto como lo hacía [^\d+]
+            phone = ''.join(c for c in phone if c == '+' or c.isdecimal())
         return phone if phone else None
 
-    def _normalize_full_name(self, contact: Dict) -> str:
+    def _normalize_full_name(self, contact: Contact) -> str:
         """Normaliza el nombre completo del contacto"""
-        if contact['fn']:
-            return contact['fn']
+        if contact.fn:
+            return contact.fn
         parts = []
-        if contact['given_name']: parts.append(contact['given_name'])
-        if contact['middle_name']: parts.append(contact['middle_name'])
-        if contact['family_name']: parts.append(contact['family_name'])
+        if contact.given_name: parts.append(contact.given_name)
+        if contact.middle_name: parts.append(contact.middle_name)
+        if contact.family_name: parts.append(contact.family_name)
         if parts:
             return ' '.join(parts)
-        if contact['phones']:
-            return f"Contacto {contact['phones'][0]['number']}"
+        if contact.phones:
+            return f"Contacto {contact.phones[0]['number']}"
         return "Sin nombre"
 
 
+# Instancia sin estado usada por los procesos del pool
+_WORKER_PARSER = VCardParser('')
+
+
+def _init_worker(country_code: str):
+    """Inicializa el parser de cada proceso del pool con la configuración del principal"""
+    global _WORKER_PARSER
+    _WORKER_PARSER = VCardParser('', country_code=country_code)
+
+
+def _parse_vcard_worker(lines: List[str]) -> Optional[Contact]:
+    """Punto de entrada a nivel de módulo (serializable) para multiprocessing"""
+    return _WORKER_PARSER._parse_vcard(lines)
+
+
 class ContactMerger:
     """Unifica contactos duplicados basándose en nombre o teléfono"""
 
-    def __init__(self, contacts: List[Dict]):
+    def __init__(self, contacts: List[Contact]):
         self.contacts = contacts
 
-    def merge_duplicates(self) -> List[Dict]:
+    def merge_duplicates(self) -> List[Contact]:
         """Fusiona contactos duplicados"""
-        # Índices por teléfono y por nombre
-        phone_index: Dict[str, List[int]] = defaultdict(list)
-        name_index: Dict[str, List[int]] = defaultdict(list)
-
-        # Construir índices
-        for idx, contact in enumerate(self.contacts):
-            # Indexar por nombre
-            name_key = contact['fn'].lower().strip()
-            if name_key and name_key != 'sin nombre':
-                name_index[name_key].append(idx)
-
-            # Indexar por teléfonos
-            for phone in contact['phones']:
-                phone_index[phone['number']].append(idx)
-
-        # Encontrar grupos de contactos a fusionar
-        merged_groups: List[Set[int]] = []
-        processed = set()
-
-        for indices in phone_index.values():
-            if len(indices) > 1:
-                # Múltiples contactos con el mismo teléfono
-                group = set(indices)
-                merged_groups.append(group)
-                processed.update(group)
-
-        for indices in name_index.values():
-            if len(indices) > 1:
-                # Múltiples contactos con el mismo nombre
-                group = set(indices)
-                # Ver si ya están en un grupo
-                merged = False
-                for existing_group in merged_groups:
-                    if group & existing_group:
-                        existing_group.update(group)
-                        merged = True
-                        break
-                if not merged:
-                    merged_groups.append(group)
-                processed.update(group)
-
-        # Fusionar grupos
-        merged_contacts = []
-
-        for group in merged_groups:
-            merged_contact = self._merge_group([self.contacts[i] for i in group])
-            merged_contacts.append(merged_contact)
-
-        # Agregar contactos no fusionados
-        for idx, contact in enumerate(self.contacts):
-            if idx not in processed:
-                merged_contacts.append(contact)
-
-        return merged_contacts
-
-    def _merge_group(self, group: List[Dict]) -> Dict:
+        # Colapsar primero los duplicados exactos para reducir el trabajo posterior
+        contacts = self._coalesce_exact(self.contacts)
+
+        # Union-Find sobre índices de contacto: cada teléfono o nombre
+        # compartido une los conjuntos, también de forma transitiva
+        parent = list(range(len(contacts)))
+        rank = [0] * len(contacts)
+
+        def find(x: int) -> int:
+            root = x
+            while parent[root] != root:
+                root = parent[root]
+            # Compresión de caminos
+            while parent[x] != root:
+                parent[x], x = root, parent[x]
+            return root
+
+        def union(a: int, b: int):
+            ra, rb = find(a), find(b)
+            if ra == rb:
+                return
+            if rank[ra] < rank[rb]:
+                ra, rb = rb, ra
+            parent[rb] = ra
+            if rank[ra] == rank[rb]:
+                rank[ra] += 1
+
+        # Primer contacto visto por teléfono y por nombre; en una sola pasada
+        # cada contacto se une con el primero que comparte su clave
+        first_phone: Dict[str, int] = {}
+        first_name: Dict[str, int] = {}
+
+        for idx, contact in enumerate(contacts):
+            # Por nombre
+            if contact.name_key and contact.name_key != _NO_NAME_KEY:
+                first = first_name.setdefault(contact.name_key, idx)
+                if first != idx:
+                    union(idx, first)
+
+            # Por teléfonos
+            for phone in contact.phones:
+                first = first_phone.setdefault(phone['canon'], idx)
+                if first != idx:
+                    union(idx, first)
+
+        # Agrupar por raíz, conservando el orden de aparición
+        groups: Dict[int, List[int]] = defaultdict(list)
+        for idx in range(len(contacts)):
+            groups[find(idx)].append(idx)
+
+        # Fusionar grupos; los contactos sin duplicados pasan tal cual
+        return [
+            self._merge_group([contacts[i] for i in group]) if len(group) > 1 else contacts[group[0]]
+            for group in groups.values()
+        ]
+
+    def _exact_key(self, contact: Contact) -> Tuple:
+        """Clave que identifica contactos idénticos en todos sus campos de datos"""
+        return (
+            contact.fn.lower().strip(),
+            tuple(sorted(p['number'] for p in contact.phones)),
+            tuple(sorted(e['_lc'] for e in contact.emails)),
+            contact.org,
+            contact.notes,
+            tuple(sorted((a['address'], a['type']) for a in contact.addresses)),
+        )
+
+    def _coalesce_exact(self, contacts: List[Contact]) -> List[Contact]:
+        """Une en una sola pasada los contactos exactamente iguales"""
+        groups: List[List[Contact]] = []
+        exact_groups: Dict[Tuple, List[Contact]] = {}
+        for contact in contacts:
+            # Sin nombre, teléfono ni email no hay nada que los identifique: nunca se unen
+            if contact.name_key == _NO_NAME_KEY and not contact.phones and not contact.emails:
+                groups.append([contact])
+                continue
+
+            key = self._exact_key(contact)
+            group = exact_groups.get(key)
+            if group is None:
+                group = exact_groups[key] = []
+                groups.append(group)
+            group.append(contact)
+
+        return [
+            self._merge_group(group) if len(group) > 1 else group[0]
+            for group in groups
+        ]
+
+    def _merge_group(self, group: List[Contact]) -> Contact:
         """Fusiona un grupo de contactos en uno solo"""
-        merged = {
-            'fn': '',
-            'family_name': '',
-            'given_name': '',
-            'middle_name': '',
-            'phones': [],
-            'emails': [],
-            'notes': '',
-            'org': '',
-            'addresses': [],
-            'photo': ''
-        }
-
-        seen_phones = set()
-        seen_emails = set()
+        merged = Contact()
+
+        # Únicos por clave; el dict conserva el primero y el orden de aparición.
+        # Los teléfonos se deduplican por número exacto: nunca se descarta uno distinto
+        phones: Dict[str, Dict] = {}
+        emails: Dict[str, Dict] = {}
+        addresses: Dict[Tuple[str, str], Dict] = {}
         notes_parts = []
-        orgs = []
+        best_len = 0
+        have_photo = False
 
         for contact in group:
             # Nombre: usar el más completo
-            if len(contact['fn']) > len(merged['fn']):
-                merged['fn'] = contact['fn']
-                merged['given_name'] = contact['given_name']
-                merged['family_name'] = contact['family_name']
-                merged['middle_name'] = contact['middle_name']
+            fn_len = len(contact.fn)
+            if fn_len > best_len:
+                best_len = fn_len
+                merged.fn = contact.fn
+                merged.given_name = contact.given_name
+                merged.family_name = contact.family_name
+                merged.middle_name = contact.middle_name
 
             # Teléfonos: agregar únicos
-            for phone in contact['phones']:
-                if phone['number'] not in seen_phones:
-                    merged['phones'].append(phone)
-                    seen_phones.add(phone['number'])
+            for phone in contact.phones:
+                phones.setdefault(phone['number'], phone)
 
             # Emails: agregar únicos
-            for email in contact['emails']:
-                if email['address'].lower() not in seen_emails:
-                    merged['emails'].append(email)
-                    seen_emails.add(email['address'].lower())
+            for email in contact.emails:
+                emails.setdefault(email['_lc'], email)
 
             # Notas: concatenar
-            if contact['notes']:
-                notes_parts.append(contact['notes'])
-
-            # Organización
-            if contact['org'] and contact['org'] not in orgs:
-                orgs.append(contact['org'])
+            if contact.notes:
+                notes_parts.append(contact.notes)
 
             # Direcciones
-            for addr in contact['addresses']:
-                if addr not in merged['addresses']:
-                    merged['addresses'].append(addr)
+            for addr in contact.addresses:
+                addresses.setdefault((addr['address'], addr['type']), addr)
 
             # Foto
-            if contact['photo'] and not merged['photo']:
-                merged['photo'] = contact['photo']
+            if contact.photo and not have_photo:
+                merged.photo = contact.photo
+                have_photo = True
+
+        merged.phones = list(phones.values())
+        merged.emails = list(emails.values())
+        merged.addresses = list(addresses.values())
+        merged.name_key = _name_key(merged.fn)
 
         # Unir notas
-        merged['notes'] = ' | '.join(notes_parts)
+        merged.notes = ' | '.join(notes_parts)
 
-        # Unir organizaciones
-        merged['org'] = ', '.join(orgs)
+        # Unir organizaciones únicas conservando el orden
+        merged.org = ', '.join(dict.fromkeys(c.org for c in group if c.org))
 
         return merged
 
@@ -269,9 +480,12 @@ class ContactMerger:
 class GoogleContactsCSV:
     """Genera CSV compatible con Google Contacts"""
 
-    def __init__(self, contacts: List[Dict], output_file: str):
+    def __init__(self, contacts: List[Contact], output_file: str):
         self.contacts = contacts
         self.output_file = output_file
+        # Totales calculados durante generate() para las estadísticas
+        self.total_phones = 0
+        self.total_emails = 0
         # Encabezados EXACTOS proporcionados por el usuario
         self.headers = [
             'First Name', 'Middle Name', 'Last Name', 'Phonetic First Name',
@@ -285,42 +499,54 @@ class GoogleContactsCSV:
             'Address 1 - Postal Code', 'Address 1 - Country', 'Address 1 - Extended Address',
             'Custom Field 1 - Label', 'Custom Field 1 - Value'
         ]
+        # Posición de cada columna dentro de la fila
+        self._col = {name: i for i, name in enumerate(self.headers)}
+        # Pares (etiqueta, valor) precalculados: hasta 3 teléfonos y 1 email
+        self._phone_cols = [(self._col[f'Phone {i} - Label'], self._col[f'Phone {i} - Value']) for i in range(1, 4)]
+        self._email_cols = [(self._col['E-mail 1 - Label'], self._col['E-mail 1 - Value'])]
 
     def generate(self):
         """Genera el archivo CSV"""
-        with open(self.output_file, 'w', newline='', encoding='utf-8-sig') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=self.headers)
-            writer.writeheader()
+        # Búfer de 1 MiB para reducir las escrituras al sistema en exportaciones grandes
+        with open(self.output_file, 'w', newline='', encoding='utf-8-sig', buffering=1 << 20) as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(self.headers)
+            col = self._col
+            total_phones = total_emails = 0
 
             for contact in self.contacts:
-                # Mapeo a las nuevas columnas
-                row = {
-                    'First Name': contact.get('given_name', ''),
-                    'Middle Name': contact.get('middle_name', ''),
-                    'Last Name': contact.get('family_name', ''),
-                    'Organization Name': contact.get('org', ''),
-                    'Notes': contact.get('notes', ''),
-                    'Photo': contact.get('photo', '')
-                }
-
-                # Mapear hasta 3 teléfonos
-                for i, phone in enumerate(contact.get('phones', [])[:3], 1):
-                    row[f'Phone {i} - Label'] = phone.get('type', 'Other')
-                    row[f'Phone {i} - Value'] = phone.get('number', '')
+                total_phones += len(contact.phones)
+                total_emails += len(contact.emails)
+
+                # Fila posicional con las columnas no usadas vacías
+                row = [''] * len(self.headers)
+                row[col['First Name']] = contact.given_name
+                row[col['Middle Name']] = contact.middle_name
+                row[col['Last Name']] = contact.family_name
+                row[col['Organization Name']] = contact.org
+                row[col['Notes']] = contact.notes
+                row[col['Photo']] = contact.photo
+
+                # Mapear hasta 3 teléfonos (zip corta en el número de columnas)
+                for (label_idx, value_idx), phone in zip(self._phone_cols, contact.phones):
+                    row[label_idx] = phone.get('type', 'Other')
+                    row[value_idx] = phone.get('number', '')
 
                 # Mapear hasta 1 email (se puede extender si es necesario)
-                for i, email in enumerate(contact.get('emails', [])[:1], 1):
-                    row[f'E-mail {i} - Label'] = email.get('type', 'Other')
-                    row[f'E-mail {i} - Value'] = email.get('address', '')
+                for (label_idx, value_idx), email in zip(self._email_cols, contact.emails):
+                    row[label_idx] = email.get('type', 'Other')
+                    row[value_idx] = email.get('address', '')
 
                 # Mapear primera dirección
-                if contact.get('addresses'):
-                    address = contact['addresses'][0]
-                    row['Address 1 - Label'] = address.get('type', 'Home')
-                    row['Address 1 - Formatted'] = address.get('address', '')
+                if contact.addresses:
+                    address = contact.addresses[0]
+                    row[col['Address 1 - Label']] = address.get('type', 'Home')
+                    row[col['Address 1 - Formatted']] = address.get('address', '')
 
                 writer.writerow(row)
 
+        self.total_phones = total_phones
+        self.total_emails = total_emails
         print(f"✓ CSV generado exitosamente: {self.output_file}")
 
 
@@ -342,12 +568,33 @@ def main():
     else:
         output_file = 'salida.csv'
 
+    # Procesos para parsear en paralelo (opcional, por defecto uno)
+    if len(sys.argv) > 3:
+        try:
+            workers = max(1, int(sys.argv[3]))
+        except ValueError:
+            print(f"Error: el número de procesos debe ser un entero, se recibió '{sys.argv[3]}'")
+            print(f"Uso: {sys.argv[0]} [entrada.vcf] [salida.csv] [procesos] [código de país]")
+            sys.exit(1)
+    else:
+        workers = 1
+
+    # Código de país por defecto para comparar números nacionales (opcional, p. ej. 34)
+    if len(sys.argv) > 4:
+        country_code = sys.argv[4].lstrip('+')
+        if not country_code.isdigit():
+            print(f"Error: el código de país debe ser numérico, se recibió '{sys.argv[4]}'")
+            print(f"Uso: {sys.argv[0]} [entrada.vcf] [salida.csv] [procesos] [código de país]")
+            sys.exit(1)
+    else:
+        country_code = ''
+
     print(f"\n📂 Archivo de entrada: {input_file}")
     print(f"📄 Archivo de salida: {output_file}\n")
 
     # 1. Parsear el archivo VCF
     print("⏳ Paso 1/3: Parseando archivo .vcf...")
-    parser = VCardParser(input_file)
+    parser = VCardParser(input_file, workers, country_code)
     contacts = parser.parse()
     print(f"   ✓ {len(contacts)} contactos extraídos")
 
@@ -371,10 +618,8 @@ def main():
     print(f"   • Duplicados fusionados: {duplicates_removed}")
     print(f"   • Contactos en CSV final: {len(merged_contacts)}")
 
-    total_phones = sum(len(c['phones']) for c in merged_contacts)
-    total_emails = sum(len(c['emails']) for c in merged_contacts)
-    print(f"   • Total teléfonos: {total_phones}")
-    print(f"   • Total emails: {total_emails}")
+    print(f"   • Total teléfonos: {csv_generator.total_phones}")
+    print(f"   • Total emails: {csv_generator.total_emails}")
 
     print("\n✅ ¡Proceso completado exitosamente!")
     print(f"   Puedes importar {output_file} directamente en Google Contacts")